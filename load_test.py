@@ -0,0 +1,399 @@
+"""
+Нагрузочный тест бота без Telegram: заглушка Bot API, генератор обновлений и прогон
+сценариев через настоящий диспетчер main.dp.
+
+Запуск:
+    python load_test.py --groups 2 --members 50 --concurrency 20 --api-latency 0.02 --output results.json
+
+Заглушка Bot API слушает localhost и отвечает на getMe, getChat, getChatAdministrators,
+sendMessage, editMessageText, editMessageReplyMarkup, answerCallbackQuery и другие методы
+с задержкой --api-latency секунд. Бот подключается к ней через TELEGRAM_API_URL и по
+умолчанию работает с новой временной базой SQLite (другую БД задает --database-url,
+она должна быть пустой). Лимиты очереди исходящих сообщений снимаются, чтобы измерять
+сам бот, а не темп Telegram (--telegram-limits оставляет их как в настройках).
+
+Сценарии выполняются по очереди; внутри сценария обновления каждого пользователя идут
+последовательно (как в Telegram), а разные пользователи - параллельно, не больше
+--concurrency одновременно. Фоновые задачи ведущего воркера (напоминания, сводки) не
+запускаются; буфер присутствия и хранилище FSM работают как обычно.
+
+Результат - JSON (в stdout и, если задан, в файл --output): для каждого сценария число
+обновлений и ошибок, пропускная способность, задержки обработки одного обновления
+(p50/p90/p99/max, мс), число запросов к БД и вызовов Bot API по методам.
+"""
+import argparse
+import asyncio
+import importlib
+import itertools
+import json
+import logging
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from aiohttp import web
+
+BOT_ID = 123456789
+BOT_TOKEN = f"{BOT_ID}:LoadTestTokenLoadTestTokenLoadTestTok"
+SCENARIOS = ['group_start', 'group_chatter', 'private_start', 'create_task', 'my_tasks', 'complete_task']
+
+
+# --- Заглушка Bot API ---
+
+class FakeBotAPI:
+    """HTTP-сервер в формате Bot API: правдоподобные ответы, задержка и счетчики вызовов."""
+
+    def __init__(self, latency: float, admins: dict[int, list[int]]):
+        self.latency = latency
+        self.admins = admins  # chat_id -> id администраторов для getChatAdministrators
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1)
+        self._runner: web.AppRunner | None = None
+        self.url: str | None = None
+        self._results = {
+            'getMe': lambda params: bot_user(),
+            'getChat': lambda params: full_chat(int(params['chat_id'])),
+            'getChatAdministrators': lambda params: [
+                {'status': 'creator', 'user': synthetic_user(user_id), 'is_anonymous': False}
+                for user_id in self.admins.get(int(params['chat_id']), [])
+            ],
+            'sendMessage': self._message,
+            'sendDocument': self._message,
+            'editMessageText': self._message,
+            'editMessageReplyMarkup': self._message,
+        }
+
+    def _message(self, params: dict) -> dict:
+        chat_id = int(params.get('chat_id', 0))
+        return {
+            'message_id': int(params.get('message_id') or next(self._message_ids)),
+            'date': int(time.time()),
+            'chat': short_chat(chat_id),
+            'from': bot_user(),
+            'text': params.get('text', ''),
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.calls[method] += 1
+        params = dict(await request.post())
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        # Остальные методы (answerCallbackQuery, deleteMessage, deleteWebhook, ...) возвращают True
+        result = self._results.get(method, lambda params: True)(params)
+        return web.json_response({'ok': True, 'result': result})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/bot{token}/{method}', self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, '127.0.0.1', 0).start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+def bot_user() -> dict:
+    return {'id': BOT_ID, 'is_bot': True, 'first_name': "Load test bot", 'username': 'load_test_bot'}
+
+
+def synthetic_user(user_id: int) -> dict:
+    return {'id': user_id, 'is_bot': False, 'first_name': f"User {user_id}", 'username': f"user{user_id}"}
+
+
+def short_chat(chat_id: int) -> dict:
+    if chat_id > 0:
+        return {'id': chat_id, 'type': 'private', 'first_name': f"User {chat_id}"}
+    return {'id': chat_id, 'type': 'supergroup', 'title': f"Load test group {-chat_id % 1000}"}
+
+
+def full_chat(chat_id: int) -> dict:
+    return {
+        **short_chat(chat_id),
+        'accent_color_id': 0,
+        'max_reaction_count': 11,
+        'accepted_gift_types': {
+            'unlimited_gifts': False, 'limited_gifts': False, 'unique_gifts': False, 'premium_subscription': False,
+        },
+    }
+
+
+# --- Генератор обновлений ---
+
+class UpdateFactory:
+    """Синтетические обновления в формате Bot API со сквозной нумерацией."""
+
+    def __init__(self):
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def message(self, chat_id: int, user_id: int, text: str) -> dict:
+        return {
+            'update_id': next(self._update_ids),
+            'message': {
+                'message_id': next(self._message_ids),
+                'date': int(time.time()),
+                'chat': short_chat(chat_id),
+                'from': synthetic_user(user_id),
+                'text': text,
+            },
+        }
+
+    def callback(self, user_id: int, data: str) -> dict:
+        """Нажатие inline-кнопки под сообщением бота в ЛС пользователя."""
+        update_id = next(self._update_ids)
+        return {
+            'update_id': update_id,
+            'callback_query': {
+                'id': str(update_id),
+                'from': synthetic_user(user_id),
+                'chat_instance': str(user_id),
+                'data': data,
+                'message': {
+                    'message_id': next(self._message_ids),
+                    'date': int(time.time()),
+                    'chat': short_chat(user_id),
+                    'from': bot_user(),
+                    'text': "…",
+                },
+            },
+        }
+
+
+class Population:
+    """Группы, их участники и администраторы."""
+
+    def __init__(self, groups: int, members: int, admins: int):
+        self.groups = [-1001000000000 - i for i in range(groups)]
+        self.members = {chat_id: [10000 + i * members + j for j in range(members)] for i, chat_id in enumerate(self.groups)}
+        self.admins = {chat_id: [100 + i * admins + j for j in range(admins)] for i, chat_id in enumerate(self.groups)}
+
+    def everyone(self, chat_id: int) -> list[int]:
+        return self.admins[chat_id] + self.members[chat_id]
+
+
+async def build_scenario(name: str, bot_main, population: Population, factory: UpdateFactory, args, rng: random.Random) -> list[list[dict]]:
+    """Сессии сценария: список последовательностей обновлений, по одной на пользователя."""
+    groups = population.groups
+    if name == 'group_start':
+        # Регистрация в группе через /start (прямая запись в users_tbl)
+        return [[factory.message(chat_id, user_id, '/start')] for chat_id in groups for user_id in population.everyone(chat_id)]
+
+    if name == 'group_chatter':
+        return [
+            [factory.message(chat_id, user_id, f"Сообщение {k}") for k in range(args.messages)]
+            for chat_id in groups for user_id in population.everyone(chat_id)
+        ]
+
+    if name == 'private_start':
+        return [[factory.message(user_id, user_id, '/start')] for chat_id in groups for user_id in population.everyone(chat_id)]
+
+    if name == 'create_task':
+        today = datetime.now()
+        start_day = bot_main.SimpleCalendarCallback(act='day', year=today.year, month=today.month, day=today.day).pack()
+        end = today + timedelta(days=1)
+        end_day = bot_main.SimpleCalendarCallback(act='day', year=end.year, month=end.month, day=end.day).pack()
+        sessions = []
+        for chat_id in groups:
+            for admin_id in population.admins[chat_id]:
+                # /admin в группе выбирает ее контекстом для мастера в ЛС
+                updates = [factory.message(chat_id, admin_id, '/admin')]
+                for k in range(args.tasks):
+                    assignee = rng.choice(population.members[chat_id])
+                    updates += [
+                        factory.message(admin_id, admin_id, "Новая задача"),
+                        factory.callback(admin_id, f"assign_user_{assignee}"),
+                        factory.callback(admin_id, start_day),
+                        factory.message(admin_id, admin_id, "09:00"),
+                        factory.callback(admin_id, end_day),
+                        factory.message(admin_id, admin_id, "18:00"),
+                        factory.message(admin_id, admin_id, f"Задача нагрузочного теста {k}"),
+                        factory.callback(admin_id, "task_confirm"),
+                    ]
+                sessions.append(updates)
+        return sessions
+
+    if name == 'my_tasks':
+        return [
+            [factory.message(user_id, user_id, "Мои задачи")] + [
+                factory.callback(user_id, bot_main.MyTasksPage(status=status).pack()) for status in ('open', 'late', 'done', 'all')
+            ]
+            for chat_id in groups for user_id in population.members[chat_id]
+        ]
+
+    if name == 'complete_task':
+        Task = bot_main.Task
+        async with bot_main.async_session() as session:
+            rows = (await session.execute(
+                bot_main.select(Task.user_id, Task.id).where(Task.is_completed == False).order_by(Task.user_id, Task.id)
+            )).all()
+        sessions: dict[int, list[dict]] = {}
+        for user_id, task_id in rows:
+            sessions.setdefault(user_id, []).append(factory.callback(user_id, f"usr_complete_task|{task_id}"))
+        return list(sessions.values())
+
+    raise ValueError(f"Неизвестный сценарий: {name}")
+
+
+# --- Прогон ---
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль по ближайшему рангу для отсортированного списка."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(q * len(values)) - 1)]
+
+
+async def run_scenario(name: str, sessions: list[list[dict]], bot_main, api: FakeBotAPI, db_queries: Counter, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    api_before = Counter(api.calls)
+    db_before = db_queries['total']
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run_session(updates: list[dict]):
+        nonlocal errors
+        async with slots:
+            for payload in updates:
+                update = bot_main.types.Update.model_validate(payload, context={"bot": bot_main.bot})
+                started = time.perf_counter()
+                try:
+                    await bot_main.dp.feed_update(bot_main.bot, update)
+                except Exception as e:
+                    errors += 1
+                    logging.warning(f"{name}: ошибка обработки обновления {update.update_id}: {e}")
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_session(updates) for updates in sessions))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    api_calls = api.calls - api_before
+    return {
+        'scenario': name,
+        'sessions': len(sessions),
+        'updates': len(latencies),
+        'errors': errors,
+        'duration_s': round(duration, 3),
+        'throughput_ups': round(len(latencies) / duration, 1) if duration else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 2),
+            'p90': round(percentile(latencies, 0.90) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'max': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+        'db_queries': db_queries['total'] - db_before,
+        'api_calls': sum(api_calls.values()),
+        'api_calls_by_method': dict(sorted(api_calls.items())),
+    }
+
+
+async def run(args, database_url: str) -> dict:
+    population = Population(args.groups, args.members, args.admins)
+    api = FakeBotAPI(latency=args.api_latency, admins=population.admins)
+    await api.start()
+
+    # main читает настройки при импорте, поэтому окружение готовим заранее
+    os.environ.update({
+        'TOKEN': BOT_TOKEN,
+        'TELEGRAM_API_URL': api.url,
+        'DATABASE_URL': database_url,
+        'WORKER_COUNT': '1',
+        'METRICS_PORT': '0',
+    })
+    if not args.telegram_limits:
+        os.environ.update({'OUTBOX_GLOBAL_RATE': '1000000', 'OUTBOX_CHAT_RATE': '1000000', 'OUTBOX_CHAT_BURST': '1000000'})
+    bot_main = importlib.import_module('main')
+
+    db_queries: Counter = Counter()
+
+    @bot_main.event.listens_for(bot_main.engine.sync_engine, 'after_cursor_execute')
+    def count_query(*_):
+        db_queries['total'] += 1
+
+    await bot_main.init_db()
+    background = [asyncio.create_task(bot_main.presence_buffer.run()), asyncio.create_task(bot_main.storage.run())]
+    factory = UpdateFactory()
+    rng = random.Random(args.seed)
+    results = []
+    try:
+        for name in args.scenarios:
+            sessions = await build_scenario(name, bot_main, population, factory, args, rng)
+            result = await run_scenario(name, sessions, bot_main, api, db_queries, args.concurrency)
+            logging.info(
+                f"{name}: {result['updates']} обновлений, {result['throughput_ups']} обн/с, "
+                f"p50 {result['latency_ms']['p50']} мс, p99 {result['latency_ms']['p99']} мс"
+            )
+            results.append(result)
+            # Сценарии опираются на данные предыдущих (участники, задачи): дописываем буферы в БД
+            await bot_main.presence_buffer.flush()
+            await bot_main.storage.flush()
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        await bot_main.storage.close()
+        await bot_main.bot.session.close()
+        await bot_main.engine.dispose()
+        await api.stop()
+
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'database': bot_main.make_url(database_url).render_as_string(hide_password=True),
+        'settings': {
+            'groups': args.groups,
+            'members': args.members,
+            'admins': args.admins,
+            'messages': args.messages,
+            'tasks': args.tasks,
+            'concurrency': args.concurrency,
+            'api_latency_s': args.api_latency,
+            'telegram_limits': args.telegram_limits,
+            'seed': args.seed,
+        },
+        'scenarios': results,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Нагрузочный тест бота с заглушкой Bot API.")
+    parser.add_argument('--groups', type=int, default=2, help="число групп")
+    parser.add_argument('--members', type=int, default=50, help="участников в каждой группе (кроме админов)")
+    parser.add_argument('--admins', type=int, default=2, help="администраторов в каждой группе")
+    parser.add_argument('--messages', type=int, default=5, help="сообщений от каждого участника в group_chatter")
+    parser.add_argument('--tasks', type=int, default=10, help="задач, создаваемых каждым админом в create_task")
+    parser.add_argument('--concurrency', type=int, default=20, help="сколько пользователей обрабатывается одновременно")
+    parser.add_argument('--api-latency', type=float, default=0.02, help="задержка ответа заглушки Bot API, сек")
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=SCENARIOS, help="сценарии в порядке запуска")
+    parser.add_argument('--database-url', help="БД для теста (по умолчанию временный файл SQLite)")
+    parser.add_argument('--telegram-limits', action='store_true', help="не снимать лимиты очереди исходящих сообщений")
+    parser.add_argument('--seed', type=int, default=1, help="зерно генератора случайных чисел")
+    parser.add_argument('--output', help="файл для результатов в JSON")
+    parser.add_argument('--verbose', action='store_true', help="подробный журнал бота")
+    args = parser.parse_args()
+
+    # Настраиваем журнал до импорта main, чтобы его basicConfig не включил уровень INFO
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        stream=sys.stderr
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        report = asyncio.run(run(args, args.database_url or f"sqlite+aiosqlite:///{os.path.join(tmp, 'load_test.db')}"))
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
@@ -0,0 +1,109 @@
+"""
+Проверка обновления схемы: база, созданная первой версией бота, должна доводиться
+до текущей схемы миграциями из main.MIGRATIONS.
+
+Запуск из корня репозитория:
+    python -m pytest tests
+
+Тест создает во временном файле SQLite таблицы users_tbl и tasks_tbl в том виде,
+в каком их создавала первая версия бота, добавляет пользователя и задачу, выполняет
+init_db и проверяет, что в базе есть все таблицы, столбцы и индексы текущих моделей,
+все миграции записаны в schema_migrations_tbl, а данные пережили обновление.
+"""
+import asyncio
+import importlib
+import sys
+
+import pytest
+from sqlalchemy import inspect, text
+
+# Схема users_tbl и tasks_tbl до появления миграций (create_all первой версии)
+BASELINE_DDL = [
+    """
+    CREATE TABLE users_tbl (
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        username VARCHAR,
+        full_name VARCHAR NOT NULL,
+        status VARCHAR NOT NULL,
+        first_seen DATETIME NOT NULL,
+        last_seen DATETIME NOT NULL,
+        PRIMARY KEY (user_id, chat_id)
+    )
+    """,
+    """
+    CREATE TABLE tasks_tbl (
+        id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        chat_id INTEGER NOT NULL,
+        start_datetime DATETIME NOT NULL,
+        end_datetime DATETIME NOT NULL,
+        description VARCHAR NOT NULL,
+        is_completed BOOLEAN NOT NULL,
+        PRIMARY KEY (id),
+        FOREIGN KEY(user_id, chat_id) REFERENCES users_tbl (user_id, chat_id)
+    )
+    """,
+    "INSERT INTO users_tbl VALUES (1001, -100500, 'Ivan_P', 'Иван Петров', 'member', "
+    "'2024-01-01 10:00:00', '2024-01-02 10:00:00')",
+    "INSERT INTO tasks_tbl VALUES (1, 1001, -100500, '2024-01-01 10:00:00', '2024-01-05 18:00:00', "
+    "'Подготовить отчёт', 0)",
+]
+
+
+def schema_problems(conn, bot_main) -> list[str]:
+    """Расхождения между базой и текущими моделями."""
+    inspector = inspect(conn)
+    problems = []
+    for table in bot_main.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            problems.append(f"нет таблицы {table.name}")
+            continue
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        problems.extend(f"нет столбца {table.name}.{column.name}" for column in table.columns if column.name not in columns)
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        problems.extend(f"нет индекса {index.name}" for index in table.indexes if index.name not in indexes)
+
+    applied = set(conn.execute(text("SELECT version FROM schema_migrations_tbl")).scalars())
+    problems.extend(f"не записана миграция {version}" for version, _, _ in bot_main.MIGRATIONS if version not in applied)
+
+    user = conn.execute(text("SELECT name_key, username_key FROM users_tbl WHERE user_id = 1001")).one_or_none()
+    if user != ('иван петров', 'ivan_p'):
+        problems.append(f"ключи поиска пользователя не заполнены: {user}")
+    task = conn.execute(text("SELECT description, notified_mask FROM tasks_tbl WHERE id = 1")).one_or_none()
+    if task != ('Подготовить отчёт', 0):
+        problems.append(f"задача изменилась при обновлении: {task}")
+    found = conn.execute(text("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'description : отчет*'")).scalars().all()
+    if found != [1]:
+        problems.append(f"задача не находится поиском: {found}")
+    return problems
+
+
+@pytest.fixture
+def bot_main(tmp_path, monkeypatch):
+    """main с базой во временном файле; main читает настройки при импорте, поэтому окружение готовится заранее."""
+    monkeypatch.setenv('TOKEN', '123456:CheckUpgradeTokenCheckUpgradeToken')
+    monkeypatch.setenv('DATABASE_URL', f"sqlite+aiosqlite:///{tmp_path / 'baseline.db'}")
+    monkeypatch.setenv('METRICS_PORT', '0')
+    monkeypatch.delitem(sys.modules, 'main', raising=False)
+    yield importlib.import_module('main')
+    sys.modules.pop('main', None)
+
+
+async def upgrade(bot_main) -> list[str]:
+    try:
+        async with bot_main.engine.begin() as conn:
+            for ddl in BASELINE_DDL:
+                await conn.exec_driver_sql(ddl)
+        await bot_main.init_db()
+        # Повторный запуск ничего не должен менять
+        await bot_main.init_db()
+        async with bot_main.engine.connect() as conn:
+            return await conn.run_sync(schema_problems, bot_main)
+    finally:
+        await bot_main.bot.session.close()
+        await bot_main.engine.dispose()
+
+
+def test_upgrade_from_first_version(bot_main):
+    assert asyncio.run(upgrade(bot_main)) == []